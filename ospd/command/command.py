@@ -21,10 +21,10 @@ import re
 import logging
 import subprocess
 
-from decimal import Decimal
 from typing import Optional, Dict, Any, Union, Iterator
 
-from xml.etree.ElementTree import Element, SubElement
+from xml.etree.ElementTree import Element
+from xml.sax.saxutils import escape, quoteattr
 
 import psutil
 
@@ -95,68 +95,127 @@ class HelpCommand(BaseCommand):
     description = 'Print the commands help.'
     attributes = {'format': 'Help format. Could be text or xml.'}
 
+    def __init__(self, daemon):
+        super().__init__(daemon)
+
+        self._cached_responses = {}  # type: Dict[str, bytes]
+        self._cached_version = None
+
     def handle_xml(self, xml: Element) -> bytes:
         help_format = xml.get('format')
 
-        if help_format is None or help_format == "text":
+        if help_format is None:
             # Default help format is text.
-            return simple_response_str(
+            help_format = "text"
+
+        if help_format not in ("text", "xml"):
+            raise OspdCommandError('Bogus help format', 'help')
+
+        # The command set only changes while the daemon is set up. Rebuild the
+        # cached responses if the daemon reports a change since then.
+        if self._cached_version != self._daemon.commands_version:
+            self._cached_responses.clear()
+            self._cached_version = self._daemon.commands_version
+
+        response = self._cached_responses.get(help_format)
+        if response is not None:
+            return response
+
+        if help_format == "text":
+            response = simple_response_str(
                 'help', 200, 'OK', self._daemon.get_help_text()
             )
-        elif help_format == "xml":
+        else:
             text = get_elements_from_dict(
                 {k: v.as_dict() for k, v in self._daemon.commands.items()}
             )
-            return simple_response_str('help', 200, 'OK', text)
+            response = simple_response_str('help', 200, 'OK', text)
 
-        raise OspdCommandError('Bogus help format', 'help')
+        self._cached_responses[help_format] = response
+
+        return response
+
+
+_VERSION_RESPONSE_TEMPLATE = (
+    '<get_version_response status="200" status_text="OK">'
+    '<protocol><name>OSP</name><version>{protocol_version}</version>'
+    '</protocol>'
+    '<daemon><name>{daemon_name}</name><version>{daemon_version}</version>'
+    '</daemon>'
+    '<scanner><name>{scanner_name}</name><version>{scanner_version}</version>'
+    '</scanner>'
+    '{vts}'
+    '</get_version_response>'
+)
+
+_VTS_VERSION_TEMPLATE = '<vts><version>{vts_version}</version></vts>'
+
+
+def _escape_text(value: Any) -> str:
+    """ Escape a value for an element text. A None value gives an empty
+    element, as with ElementTree. """
+    if value is None:
+        return ''
+
+    return escape(str(value))
 
 
 class GetVersion(BaseCommand):
     name = "get_version"
     description = 'Return various version information'
 
+    def __init__(self, daemon):
+        super().__init__(daemon)
+
+        self._cached_response = None  # type: Optional[bytes]
+        self._cached_versions = None
+
     def handle_xml(self, xml: Element) -> bytes:
         """ Handles <get_version> command.
 
         Return:
             Response string for <get_version> command.
         """
-        protocol = Element('protocol')
-
-        for name, value in [
-            ('name', 'OSP'),
-            ('version', self._daemon.get_protocol_version()),
-        ]:
-            elem = SubElement(protocol, name)
-            elem.text = value
-
-        daemon = Element('daemon')
-        for name, value in [
-            ('name', self._daemon.get_daemon_name()),
-            ('version', self._daemon.get_daemon_version()),
-        ]:
-            elem = SubElement(daemon, name)
-            elem.text = value
-
-        scanner = Element('scanner')
-        for name, value in [
-            ('name', self._daemon.get_scanner_name()),
-            ('version', self._daemon.get_scanner_version()),
-        ]:
-            elem = SubElement(scanner, name)
-            elem.text = value
-
-        content = [protocol, daemon, scanner]
-
-        vts_version = self._daemon.get_vts_version()
+        versions = (
+            self._daemon.get_protocol_version(),
+            self._daemon.get_daemon_name(),
+            self._daemon.get_daemon_version(),
+            self._daemon.get_scanner_name(),
+            self._daemon.get_scanner_version(),
+            self._daemon.get_vts_version(),
+        )
+
+        if versions == self._cached_versions:
+            return self._cached_response
+
+        (
+            protocol_version,
+            daemon_name,
+            daemon_version,
+            scanner_name,
+            scanner_version,
+            vts_version,
+        ) = versions
+
+        vts = ''
         if vts_version:
-            vts = Element('vts')
-            elem = SubElement(vts, 'version')
-            elem.text = vts_version
-            content.append(vts)
+            vts = _VTS_VERSION_TEMPLATE.format(
+                vts_version=_escape_text(vts_version)
+            )
+
+        response = _VERSION_RESPONSE_TEMPLATE.format(
+            protocol_version=_escape_text(protocol_version),
+            daemon_name=_escape_text(daemon_name),
+            daemon_version=_escape_text(daemon_version),
+            scanner_name=_escape_text(scanner_name),
+            scanner_version=_escape_text(scanner_version),
+            vts=vts,
+        ).encode('utf-8')
+
+        self._cached_versions = versions
+        self._cached_response = response
 
-        return simple_response_str('get_version', 200, 'OK', content)
+        return response
 
 
 GVMCG_TITLES = [
@@ -178,6 +237,26 @@ GVMCG_TITLES = [
     'titles',
 ]  # type: List[str]
 
+# Read the gvmcg report in chunks of the default Linux pipe buffer size
+GVMCG_PIPE_BUFSIZE = 65536
+
+# Titles without wildcards are checked with a set lookup, so only the
+# wildcard titles go through the regex engine.
+_GVMCG_EXACT_TITLES = frozenset(
+    title for title in GVMCG_TITLES if '*' not in title and '[' not in title
+)
+
+# Single alternation without capture groups, so the engine does not have to
+# record group spans while trying each title. The titles use '*' as a
+# wildcard, which must never match one of the shell control characters.
+_GVMCG_WILDCARD_TITLES_RE = re.compile(
+    '|'.join(
+        '(?:%s)' % title.replace('*', '[^|&;]*')
+        for title in GVMCG_TITLES
+        if title not in _GVMCG_EXACT_TITLES
+    )
+)
+
 
 class GetPerformance(BaseCommand):
     name = "get_performance"
@@ -219,9 +298,11 @@ class GetPerformance(BaseCommand):
             cmd.append(end)
 
         if titles:
-            combined = "(" + ")|(".join(GVMCG_TITLES) + ")"
-            forbidden = "^[^|&;]+$"
-            if re.match(combined, titles) and re.match(forbidden, titles):
+            valid_title = (
+                titles in _GVMCG_EXACT_TITLES
+                or _GVMCG_WILDCARD_TITLES_RE.fullmatch(titles) is not None
+            )
+            if valid_title:
                 cmd.append(titles)
             else:
                 raise OspdCommandError(
@@ -229,15 +310,20 @@ class GetPerformance(BaseCommand):
                 )
 
         try:
-            output = subprocess.check_output(cmd)
+            with subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, bufsize=GVMCG_PIPE_BUFSIZE
+            ) as proc:
+                output = proc.stdout.read()
+                returncode = proc.wait()
+
+            if returncode:
+                raise subprocess.CalledProcessError(returncode, cmd)
         except (subprocess.CalledProcessError, OSError) as e:
             raise OspdCommandError(
                 'Bogus get_performance format. %s' % e, 'get_performance'
             )
 
-        return simple_response_str(
-            'get_performance', 200, 'OK', output.decode()
-        )
+        return simple_response_str('get_performance', 200, 'OK', output)
 
 
 class GetScannerDetails(BaseCommand):
@@ -295,6 +381,12 @@ class GetVts(BaseCommand):
         'filter': 'Optional filter to get an specific vt collection.',
     }
 
+    # Static parts of the response, encoded once
+    _RESPONSE_BEGIN = b'<get_vts_response status="200" status_text="OK">'
+    _RESPONSE_END = b'</get_vts_response>'
+    _VTS_BEGIN = b'<vts>'
+    _VTS_END = b'</vts>'
+
     def handle_xml(self, xml: Element) -> Iterator[bytes]:
         """ Handles <get_vts> command.
         Writes the vt collection on the stream.
@@ -325,9 +417,9 @@ class GetVts(BaseCommand):
             )
         vts_selection = self._daemon.get_vts_selection_list(vt_id, filtered_vts)
         # List of xml pieces with the generator to be iterated
-        yield xml_helper.create_response('get_vts')
+        yield self._RESPONSE_BEGIN
 
-        begin_vts_tag = xml_helper.create_element('vts')
+        begin_vts_tag = self._VTS_BEGIN
         val = len(self._daemon.vts)
         begin_vts_tag = xml_helper.add_attr(begin_vts_tag, "total", val)
         if filtered_vts:
@@ -342,10 +434,10 @@ class GetVts(BaseCommand):
         yield begin_vts_tag
 
         for vt in self._daemon.get_vt_iterator(vts_selection, vt_details):
-            yield xml_helper.add_element(self._daemon.get_vt_xml(vt))
+            yield self._daemon.get_vt_xml_str(vt)
 
-        yield xml_helper.create_element('vts', end=True)
-        yield xml_helper.create_response('get_vts', end=True)
+        yield self._VTS_END
+        yield self._RESPONSE_END
 
 
 class StopScan(BaseCommand):
@@ -390,24 +482,19 @@ class GetScans(BaseCommand):
         @return: Response string for <get_scans> command.
         """
 
-        scan_id = xml.get('scan_id')
-        details = xml.get('details')
-        pop_res = xml.get('pop_results')
-        max_res = xml.get('max_results')
+        attrs = xml.attrib
 
-        if details and details == '0':
-            details = False
-        else:
-            details = True
-            if pop_res and pop_res == '1':
-                pop_res = True
-            else:
-                pop_res = False
-            if max_res:
-                max_res = int(max_res)
+        scan_id = attrs.get('scan_id')
+        details = attrs.get('details') != '0'
+
+        # pop_results and max_results are only used with detailed results.
+        pop_res = details and attrs.get('pop_results') == '1'
+        max_res = attrs.get('max_results')
+        if details and max_res:
+            max_res = int(max_res)
 
         responses = []
-        if scan_id and scan_id in self._daemon.scan_collection.ids_iterator():
+        if scan_id and self._daemon.scan_exists(scan_id):
             self._daemon.check_scan_process(scan_id)
             scan = self._daemon.get_scan_xml(scan_id, details, pop_res, max_res)
             responses.append(scan)
@@ -415,11 +502,12 @@ class GetScans(BaseCommand):
             text = "Failed to find scan '{0}'".format(scan_id)
             return simple_response_str('get_scans', 404, text)
         else:
+            check_scan_process = self._daemon.check_scan_process
+            get_scan_xml = self._daemon.get_scan_xml
+
             for scan_id in self._daemon.scan_collection.ids_iterator():
-                self._daemon.check_scan_process(scan_id)
-                scan = self._daemon.get_scan_xml(
-                    scan_id, details, pop_res, max_res
-                )
+                check_scan_process(scan_id)
+                scan = get_scan_xml(scan_id, details, pop_res, max_res)
                 responses.append(scan)
 
         return simple_response_str('get_scans', 200, 'OK', responses)
@@ -460,13 +548,36 @@ class StartScan(BaseCommand):
             Response string for <start_scan> command.
         """
 
-        target_str = xml.get('target')
-        ports_str = xml.get('ports')
+        attrs = xml.attrib
+
+        # Do the cheap validations first, so malformed requests are rejected
+        # before the target and the scanner parameters get processed.
+        scan_id = attrs.get('scan_id')
+        if scan_id and not valid_uuid(scan_id):
+            raise OspdCommandError('Invalid scan_id UUID', 'start_scan')
+
+        scanner_params = xml.find('scanner_params')
+        if scanner_params is None:
+            raise OspdCommandError('No scanner_params element', 'start_scan')
+
+        # VTS is an optional element. If present should not be empty.
+        scanner_vts = xml.find('vt_selection')
+        if scanner_vts is not None and len(scanner_vts) == 0:
+            raise OspdCommandError('VTs list is empty', 'start_scan')
+
+        target_str = attrs.get('target')
+        ports_str = attrs.get('ports')
 
         # For backward compatibility, if target and ports attributes are set,
         # <targets> element is ignored.
         if target_str is None or ports_str is None:
-            target_element = xml.find('targets/target')
+            # Plain tag lookups stay in the C implementation of find(),
+            # while a path is resolved through ElementPath.
+            targets = xml.find('targets')
+            target_element = None
+            if targets is not None:
+                target_element = targets.find('target')
+
             if target_element is None:
                 raise OspdCommandError('No targets or ports', 'start_scan')
             else:
@@ -486,33 +597,21 @@ class StartScan(BaseCommand):
                 "for start scan command."
             )
 
-        scan_id = xml.get('scan_id')
-        if scan_id is not None and scan_id != '' and not valid_uuid(scan_id):
-            raise OspdCommandError('Invalid scan_id UUID', 'start_scan')
-
-        if xml.get('parallel'):
+        if attrs.get('parallel'):
             logger.warning(
                 "parallel attribute of start_scan will be ignored, sice "
                 "parallel scan is not supported by OSPd."
             )
 
-        scanner_params = xml.find('scanner_params')
-        if scanner_params is None:
-            raise OspdCommandError('No scanner_params element', 'start_scan')
-
         params = self._daemon.preprocess_scan_params(scanner_params)
 
-        # VTS is an optional element. If present should not be empty.
         vt_selection = {}  # type: Dict
-        scanner_vts = xml.find('vt_selection')
         if scanner_vts is not None:
-            if len(scanner_vts) == 0:
-                raise OspdCommandError('VTs list is empty', 'start_scan')
-            else:
-                vt_selection = OspRequest.process_vts_params(scanner_vts)
+            vt_selection = OspRequest.process_vts_params(scanner_vts)
 
-        # Dry run case.
-        if 'dry_run' in params and int(params['dry_run']):
+        # Dry run case. The scan parameters are only processed for real scans.
+        is_dry_run = 'dry_run' in params and int(params['dry_run'])
+        if is_dry_run:
             scan_func = self._daemon.dry_run_scan
             scan_params = None
         else:
@@ -543,6 +642,9 @@ class StartScan(BaseCommand):
         return simple_response_str('start_scan', 200, 'OK', id_)
 
 
+_MEMORY_UNIT_DIVISORS = {'kb': 1024, 'mb': 1024 * 1024}
+
+
 class GetMemoryUsage(BaseCommand):
 
     name = "get_memory_usage"
@@ -557,68 +659,78 @@ class GetMemoryUsage(BaseCommand):
         if not unit:
             return str(value)
 
-        unit = unit.lower()
-
-        if unit == 'kb':
-            return str(Decimal(value) / 1024)
-
-        if unit == 'mb':
-            return str(Decimal(value) / (1024 * 1024))
+        divisor = _MEMORY_UNIT_DIVISORS.get(unit.lower())
+        if divisor is None:
+            return str(value)
 
-        return str(value)
+        # Dividing by a power of two is exact for the float values involved
+        return str(value / divisor)
 
-    @staticmethod
-    def _create_process_element(name: str, pid: int):
-        process_element = Element('process')
-        process_element.set('name', name)
-        process_element.set('pid', str(pid))
+    def __init__(self, daemon):
+        super().__init__(daemon)
 
-        return process_element
+        # psutil.Process instances are kept across requests, so only the
+        # memory info has to be read from /proc for known processes.
+        self._ps_processes = {}  # type: Dict[int, psutil.Process]
 
-    @classmethod
-    def _add_memory_info(
-        cls, process_element: Element, pid: int, unit: str = None
-    ):
+    def _get_process_xml(self, name: str, pid: int, unit: str = None) -> bytes:
         try:
-            ps_process = psutil.Process(pid)
-        except psutil.NoSuchProcess:
-            return
-
-        memory = ps_process.memory_info()
-
-        rss_element = Element('rss')
-        rss_element.text = cls._get_memory(memory.rss, unit)
-
-        process_element.append(rss_element)
+            ps_process = self._ps_processes.get(pid)
+            if ps_process is None:
+                ps_process = psutil.Process(pid)
+                self._ps_processes[pid] = ps_process
 
-        vms_element = Element('vms')
-        vms_element.text = cls._get_memory(memory.vms, unit)
-
-        process_element.append(vms_element)
-
-        shared_element = Element('shared')
-        shared_element.text = cls._get_memory(memory.shared, unit)
+            memory = ps_process.memory_info()
+        except psutil.NoSuchProcess:
+            self._ps_processes.pop(pid, None)
+            return '<process name={} pid="{}"/>'.format(
+                quoteattr(name), pid
+            ).encode('utf-8')
+
+        return (
+            '<process name={} pid="{}">'
+            '<rss>{}</rss><vms>{}</vms><shared>{}</shared>'
+            '</process>'.format(
+                quoteattr(name),
+                pid,
+                self._get_memory(memory.rss, unit),
+                self._get_memory(memory.vms, unit),
+                self._get_memory(memory.shared, unit),
+            ).encode('utf-8')
+        )
 
-        process_element.append(shared_element)
+    def handle_xml(self, xml: Element) -> Iterator[bytes]:
+        """ Handles <get_memory_usage> command.
+        Writes the memory usage of the daemon and its scan processes on the
+        stream, one process at a time.
+        """
+        xml_helper = XmlStringHelper()
 
-    def handle_xml(self, xml: Element) -> bytes:
-        processes_element = Element('processes')
         unit = xml.get('unit')
 
-        current_process = multiprocessing.current_process()
-        process_element = self._create_process_element(
-            current_process.name, current_process.pid
+        # The scan processes are tracked by the daemon already. Using them
+        # avoids active_children(), which joins finished children of any
+        # kind on every call. Finished scan processes are kept until their
+        # scan is deleted and their pid may have been reused, so only the
+        # running ones are listed.
+        processes = [multiprocessing.current_process()]
+        processes.extend(
+            proc
+            for proc in list(self._daemon.scan_processes.values())
+            if proc.is_alive()
         )
 
-        self._add_memory_info(process_element, current_process.pid, unit)
-
-        processes_element.append(process_element)
-
-        for proc in multiprocessing.active_children():
-            process_element = self._create_process_element(proc.name, proc.pid)
+        # Forget the processes which have gone away since the last request
+        pids = {proc.pid for proc in processes}
+        for pid in list(self._ps_processes):
+            if pid not in pids:
+                self._ps_processes.pop(pid, None)
 
-            self._add_memory_info(process_element, proc.pid, unit)
+        yield xml_helper.create_response('get_memory')
+        yield xml_helper.create_element('processes')
 
-            processes_element.append(process_element)
+        for proc in processes:
+            yield self._get_process_xml(proc.name, proc.pid, unit)
 
-        return simple_response_str('get_memory', 200, 'OK', processes_element)
+        yield xml_helper.create_element('processes', end=True)
+        yield xml_helper.create_response('get_memory', end=True)
@@ -37,7 +37,8 @@ from typing import (
     Iterable,
     Tuple,
 )
-from xml.etree.ElementTree import Element, SubElement
+from xml.etree.ElementTree import Element, tostring
+from xml.sax.saxutils import escape, quoteattr
 
 import defusedxml.ElementTree as secET
 
@@ -65,6 +66,8 @@ PROTOCOL_VERSION = "1.2"
 
 SCHEDULER_CHECK_PERIOD = 10  # in seconds
 
+SCAN_PROCESS_JOIN_INTERVAL = 1  # in seconds
+
 BASE_SCANNER_PARAMS = {
     'debug_mode': {
         'type': 'boolean',
@@ -134,6 +137,9 @@ class OSPDaemon:
         self.protocol_version = PROTOCOL_VERSION
 
         self.commands = {}
+        # Increased whenever the command descriptions change, so cached help
+        # responses get rebuilt.
+        self.commands_version = 0
 
         for command_class in get_commands():
             command = command_class(self)
@@ -165,6 +171,7 @@ class OSPDaemon:
         if self.command_exists(name):
             command = self.commands.get(name)
             command.attributes = attributes
+            self.commands_version += 1
 
     @deprecated(version="20.4", reason="Use set_scanner_param instead")
     def add_scanner_param(self, name: str, scanner_params: Dict) -> None:
@@ -178,6 +185,7 @@ class OSPDaemon:
         assert scanner_params
 
         self.scanner_params[name] = scanner_params
+        self.commands_version += 1
 
     def get_scanner_params(self) -> Dict:
         return self.scanner_params
@@ -370,6 +378,13 @@ class OSPDaemon:
 
         self.stop_scan_cleanup(scan_id)
 
+        if not self.scan_collection.collect_pending_results(scan_id):
+            logger.warning(
+                '%s: Not all the pending results were received before '
+                'stopping the scan.',
+                scan_id,
+            )
+
         try:
             scan_process.terminate()
         except AttributeError:
@@ -557,6 +572,9 @@ class OSPDaemon:
         else:
             logger.info("%s: Host scan finished.", scan_id)
 
+        # Send the results before the scan state changes
+        self.scan_collection.flush_results(scan_id)
+
         if self.get_scan_status(scan_id) != ScanStatus.STOPPED:
             self.finish_scan(scan_id)
 
@@ -670,11 +688,18 @@ class OSPDaemon:
         if self.get_scan_status(scan_id) == ScanStatus.RUNNING:
             return 0
 
-        # Don't delete the scan until the process stops
+        # Don't delete the scan until the process stops. The process can only
+        # exit after its pending results have been read, so keep draining
+        # them while waiting.
         exitcode = None
         try:
-            self.scan_processes[scan_id].join()
-            exitcode = self.scan_processes[scan_id].exitcode
+            scan_process = self.scan_processes[scan_id]
+            while True:
+                self.scan_collection.drain_results_queue(scan_id)
+                scan_process.join(SCAN_PROCESS_JOIN_INTERVAL)
+                exitcode = scan_process.exitcode
+                if exitcode is not None:
+                    break
         except KeyError:
             logger.debug('Scan process for %s not found', scan_id)
 
@@ -728,9 +753,11 @@ class OSPDaemon:
 
         target = self.get_scan_host(scan_id)
         progress = self.get_scan_progress(scan_id)
-        status = self.get_scan_status(scan_id)
         start_time = self.get_scan_start_time(scan_id)
+        # The end time is set after the status, so a running scan is never
+        # reported with an end time.
         end_time = self.get_scan_end_time(scan_id)
+        status = self.get_scan_status(scan_id)
         response = Element('scan')
         for name, value in [
             ('id', scan_id),
@@ -967,99 +994,121 @@ class OSPDaemon:
 
         @return: String of single vulnerability test information in XML format.
         """
+        return secET.fromstring(self._get_vt_xml_str(single_vt))
+
+    def get_vt_xml_str(self, single_vt: Tuple[str, Dict]) -> bytes:
+        """ Gets a single vulnerability test information as encoded XML
+        string.
+
+        The XML strings created by the wrapper for the different VT parts are
+        concatenated as they are, instead of being parsed into elements and
+        serialized again. If the wrapper overrides get_vt_xml(), its element
+        is serialized instead.
+
+        @return: Single vulnerability test information in XML format.
+        """
+        if type(self).get_vt_xml is not OSPDaemon.get_vt_xml:
+            return tostring(self.get_vt_xml(single_vt), encoding='utf-8')
+
+        return self._get_vt_xml_str(single_vt)
+
+    def _get_vt_xml_str(self, single_vt: Tuple[str, Dict]) -> bytes:
+        """ Builds the XML string of a single vulnerability test from the
+        wrapper's XML strings for the VT parts. """
         if not single_vt:
-            return Element('vt')
+            return b'<vt />'
 
         vt_id, vt = single_vt
 
-        name = vt.get('name')
-        vt_xml = Element('vt')
-        vt_xml.set('id', vt_id)
-
-        for name, value in [('name', name)]:
-            elem = SubElement(vt_xml, name)
-            elem.text = str(value)
+        xml_parts = [
+            '<vt id=%s>' % quoteattr(vt_id),
+            '<name>%s</name>' % escape(str(vt.get('name'))),
+        ]
 
         if vt.get('vt_params'):
-            params_xml_str = self.get_params_vt_as_xml_str(
-                vt_id, vt.get('vt_params')
+            xml_parts.append(
+                self.get_params_vt_as_xml_str(vt_id, vt.get('vt_params'))
             )
-            vt_xml.append(secET.fromstring(params_xml_str))
 
         if vt.get('vt_refs'):
-            refs_xml_str = self.get_refs_vt_as_xml_str(vt_id, vt.get('vt_refs'))
-            vt_xml.append(secET.fromstring(refs_xml_str))
+            xml_parts.append(
+                self.get_refs_vt_as_xml_str(vt_id, vt.get('vt_refs'))
+            )
 
         if vt.get('vt_dependencies'):
-            dependencies = self.get_dependencies_vt_as_xml_str(
-                vt_id, vt.get('vt_dependencies')
+            xml_parts.append(
+                self.get_dependencies_vt_as_xml_str(
+                    vt_id, vt.get('vt_dependencies')
+                )
             )
-            vt_xml.append(secET.fromstring(dependencies))
 
         if vt.get('creation_time'):
-            vt_ctime = self.get_creation_time_vt_as_xml_str(
-                vt_id, vt.get('creation_time')
+            xml_parts.append(
+                self.get_creation_time_vt_as_xml_str(
+                    vt_id, vt.get('creation_time')
+                )
             )
-            vt_xml.append(secET.fromstring(vt_ctime))
 
         if vt.get('modification_time'):
-            vt_mtime = self.get_modification_time_vt_as_xml_str(
-                vt_id, vt.get('modification_time')
+            xml_parts.append(
+                self.get_modification_time_vt_as_xml_str(
+                    vt_id, vt.get('modification_time')
+                )
             )
-            vt_xml.append(secET.fromstring(vt_mtime))
 
         if vt.get('summary'):
-            summary_xml_str = self.get_summary_vt_as_xml_str(
-                vt_id, vt.get('summary')
+            xml_parts.append(
+                self.get_summary_vt_as_xml_str(vt_id, vt.get('summary'))
             )
-            vt_xml.append(secET.fromstring(summary_xml_str))
 
         if vt.get('impact'):
-            impact_xml_str = self.get_impact_vt_as_xml_str(
-                vt_id, vt.get('impact')
+            xml_parts.append(
+                self.get_impact_vt_as_xml_str(vt_id, vt.get('impact'))
             )
-            vt_xml.append(secET.fromstring(impact_xml_str))
 
         if vt.get('affected'):
-            affected_xml_str = self.get_affected_vt_as_xml_str(
-                vt_id, vt.get('affected')
+            xml_parts.append(
+                self.get_affected_vt_as_xml_str(vt_id, vt.get('affected'))
             )
-            vt_xml.append(secET.fromstring(affected_xml_str))
 
         if vt.get('insight'):
-            insight_xml_str = self.get_insight_vt_as_xml_str(
-                vt_id, vt.get('insight')
+            xml_parts.append(
+                self.get_insight_vt_as_xml_str(vt_id, vt.get('insight'))
             )
-            vt_xml.append(secET.fromstring(insight_xml_str))
 
         if vt.get('solution'):
-            solution_xml_str = self.get_solution_vt_as_xml_str(
-                vt_id,
-                vt.get('solution'),
-                vt.get('solution_type'),
-                vt.get('solution_method'),
+            xml_parts.append(
+                self.get_solution_vt_as_xml_str(
+                    vt_id,
+                    vt.get('solution'),
+                    vt.get('solution_type'),
+                    vt.get('solution_method'),
+                )
             )
-            vt_xml.append(secET.fromstring(solution_xml_str))
 
         if vt.get('detection') or vt.get('qod_type') or vt.get('qod'):
-            detection_xml_str = self.get_detection_vt_as_xml_str(
-                vt_id, vt.get('detection'), vt.get('qod_type'), vt.get('qod')
+            xml_parts.append(
+                self.get_detection_vt_as_xml_str(
+                    vt_id,
+                    vt.get('detection'),
+                    vt.get('qod_type'),
+                    vt.get('qod'),
+                )
             )
-            vt_xml.append(secET.fromstring(detection_xml_str))
 
         if vt.get('severities'):
-            severities_xml_str = self.get_severities_vt_as_xml_str(
-                vt_id, vt.get('severities')
+            xml_parts.append(
+                self.get_severities_vt_as_xml_str(vt_id, vt.get('severities'))
             )
-            vt_xml.append(secET.fromstring(severities_xml_str))
 
         if vt.get('custom'):
-            custom_xml_str = self.get_custom_vt_as_xml_str(
-                vt_id, vt.get('custom')
+            xml_parts.append(
+                self.get_custom_vt_as_xml_str(vt_id, vt.get('custom'))
             )
-            vt_xml.append(secET.fromstring(custom_xml_str))
 
-        return vt_xml
+        xml_parts.append('</vt>')
+
+        return ''.join(xml_parts).encode('utf-8')
 
     def get_vts_selection_list(
         self, vt_id: str = None, filtered_vts: Dict = None
@@ -1138,6 +1187,8 @@ class OSPDaemon:
                 self.wait_for_children()
         except KeyboardInterrupt:
             logger.info("Received Ctrl-C shutting-down ...")
+        finally:
+            self.scan_collection.close()
 
     def scheduler(self):
         """ Should be implemented by subclass in case of need
@@ -1196,7 +1247,7 @@ class OSPDaemon:
         if not self.scaninfo_store_time:
             return
 
-        for scan_id in list(self.scan_collection.ids_iterator()):
+        for scan_id in self.scan_collection.ids_iterator():
             end_time = int(self.get_scan_end_time(scan_id))
             scan_status = self.get_scan_status(scan_id)
 
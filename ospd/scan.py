@@ -16,19 +16,36 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import ctypes
 import logging
 import multiprocessing
+import multiprocessing.util
+import os
+import threading
 import time
 import uuid
 
-from collections import OrderedDict
+from collections import deque, namedtuple
 from enum import Enum
-from typing import List, Any, Dict, Iterator, Optional
+from queue import Empty
+from typing import List, Any, Dict, Iterator, Optional, Tuple
 
 from ospd.network import target_str_to_list
 
 LOGGER = logging.getLogger(__name__)
 
+# Results added by a scan process are sent to the main process in batches,
+# once this many results are pending or at least every interval (in seconds).
+# Requests of the main process to send the pending results right away are
+# checked every check interval (in seconds).
+RESULTS_BATCH_SIZE = 64
+RESULTS_FLUSH_INTERVAL = 1
+RESULTS_FLUSH_CHECK_INTERVAL = 0.1
+
+# Maximum time (in seconds) to wait for a batch of results which a scan
+# process has already counted as sent.
+RESULTS_QUEUE_TIMEOUT = 5
+
 
 class ScanStatus(Enum):
     """Scan status. """
@@ -39,6 +56,60 @@ class ScanStatus(Enum):
     FINISHED = 3
 
 
+# Fields of a scan's target, with its hosts and its exclude hosts parsed into
+# tuples of single hosts.
+ScanTarget = namedtuple(
+    'ScanTarget',
+    [
+        'hosts',
+        'ports',
+        'exclude_hosts',
+        'finished_hosts',
+        'credentials',
+        'options',
+        'host_list',
+        'exclude_host_list',
+    ],
+)
+
+
+class ScanData:
+
+    """ A scan's data held by the scan collection. It is created by the main
+    process and inherited by the scan processes. """
+
+    def __init__(
+        self,
+        info: Dict,
+        target: ScanTarget,
+        data_manager: 'multiprocessing.managers.SyncManager',
+    ) -> None:
+        # Scan ID, start time, options and vts, in the data manager
+        self.info = info
+        self.target = target
+
+        # Results are owned by the main process and sent to it by the scan
+        # processes through the queue, in batches.
+        self.results = deque()  # type: deque
+        self.results_queue = multiprocessing.Queue()
+        self.pending_results = []  # type: List
+        self.results_sent = multiprocessing.Value(ctypes.c_longlong, 0)
+        self.results_received = multiprocessing.RawValue(ctypes.c_longlong, 0)
+        self.results_pending = multiprocessing.Value(ctypes.c_longlong, 0)
+        self.flush_request = multiprocessing.RawValue(ctypes.c_int, 0)
+
+        # Finished hosts are stored as dict keys, to be used as a set
+        self.target_progress = data_manager.dict()  # type: Dict
+        self.finished_hosts = data_manager.dict()  # type: Dict
+        self.last_host_progress = dict()  # type: Dict[str, int]
+
+        self.status = multiprocessing.RawValue(
+            ctypes.c_int, ScanStatus.INIT.value
+        )
+        self.progress = multiprocessing.RawValue(ctypes.c_double, 0)
+        self.end_time = multiprocessing.RawValue(ctypes.c_longlong, 0)
+
+
 class ScanCollection:
 
     """ Scans collection, managing scans and results read and write, exposing
@@ -62,7 +133,17 @@ class ScanCollection:
         self.data_manager = (
             None
         )  # type: Optional[multiprocessing.managers.SyncManager]
-        self.scans_table = dict()  # type: Dict
+
+        # Replaced on write, so it can be read without locking
+        self.scans_table = dict()  # type: Dict[str, ScanData]
+        self.scans_table_lock = threading.Lock()
+
+        self.owner_pid = os.getpid()
+        self.results_lock = threading.Lock()
+
+        # Used in the scan processes which have pending results
+        self.pending_results_lock = threading.Lock()
+        self.results_sender_pid = None  # type: Optional[int]
 
     def add_result(
         self,
@@ -79,24 +160,166 @@ class ScanCollection:
     ) -> None:
         """ Add a result to a scan in the table. """
 
-        assert scan_id
-        assert len(name) or len(value)
-
-        result = OrderedDict()  # type: Dict
-        result['type'] = result_type
-        result['name'] = name
-        result['severity'] = severity
-        result['test_id'] = test_id
-        result['value'] = value
-        result['host'] = host
-        result['hostname'] = hostname
-        result['port'] = port
-        result['qod'] = qod
-        results = self.scans_table[scan_id]['results']
-        results.append(result)
-
-        # Set scan_info's results to propagate results to parent process.
-        self.scans_table[scan_id]['results'] = results
+        assert scan_id and (name or value)
+
+        result = {
+            'type': result_type,
+            'name': name,
+            'severity': severity,
+            'test_id': test_id,
+            'value': value,
+            'host': host,
+            'hostname': hostname,
+            'port': port,
+            'qod': qod,
+        }  # type: Dict
+
+        scan = self.scans_table[scan_id]
+
+        if os.getpid() == self.owner_pid:
+            with self.results_lock:
+                scan.results.append(result)
+            return
+
+        if self.results_sender_pid != os.getpid():
+            self._start_results_sender()
+
+        with self.pending_results_lock:
+            scan.pending_results.append(result)
+
+            with scan.results_pending.get_lock():
+                scan.results_pending.value += 1
+
+        if (
+            len(scan.pending_results) >= RESULTS_BATCH_SIZE
+            or scan.flush_request.value
+        ):
+            self.flush_results(scan_id)
+
+    def _start_results_sender(self) -> None:
+        """ Start the thread sending the pending results of this scan
+        process, and make sure the results are sent when the process exits.
+        """
+
+        # Results pending in the parent scan process are sent by it
+        for scan in self.scans_table.values():
+            scan.pending_results = []
+        self.pending_results_lock = threading.Lock()
+        self.results_sender_pid = os.getpid()
+
+        threading.Thread(target=self._send_pending_results, daemon=True).start()
+
+        # Run before the results queues are closed, which they are with
+        # priority 10
+        multiprocessing.util.Finalize(
+            None, self._flush_all_results, exitpriority=20
+        )
+
+    def _send_pending_results(self) -> None:
+        """ Send the pending results periodically, and right away when the
+        main process requests them. """
+
+        last_flush_time = time.monotonic()
+
+        while True:
+            time.sleep(RESULTS_FLUSH_CHECK_INTERVAL)
+
+            flush_due = (
+                time.monotonic() - last_flush_time >= RESULTS_FLUSH_INTERVAL
+            )
+            if flush_due:
+                last_flush_time = time.monotonic()
+
+            for scan_id, scan in self.scans_table.items():
+                if scan.pending_results and (
+                    flush_due or scan.flush_request.value
+                ):
+                    self.flush_results(scan_id)
+
+    def _flush_all_results(self) -> None:
+        """ Send the pending results of all scans. """
+
+        for scan_id in self.scans_table:
+            self.flush_results(scan_id)
+
+    def flush_results(self, scan_id: str) -> None:
+        """ Send the results pending in a scan process to the main process.
+        """
+
+        # Nothing is pending in processes which never added a result
+        if self.results_sender_pid != os.getpid():
+            return
+
+        scan = self.scans_table[scan_id]
+
+        # The batch is counted as sent before the caller can change the scan
+        # state, see drain_results_queue().
+        with self.pending_results_lock:
+            pending_results = scan.pending_results
+            if not pending_results:
+                return
+
+            scan.pending_results = []
+
+            with scan.results_sent.get_lock():
+                scan.results_sent.value += 1
+
+            scan.results_queue.put(pending_results)
+
+        with scan.results_pending.get_lock():
+            scan.results_pending.value -= len(pending_results)
+
+    def collect_pending_results(self, scan_id: str) -> bool:
+        """ Request the scan processes to send their pending results right
+        away and move them into the results table. Used before terminating
+        the scan processes, so the results they hold aren't lost.
+
+        Return:
+            True if all the pending results were received.
+        """
+        scan = self.scans_table[scan_id]
+        scan.flush_request.value = 1
+
+        deadline = time.monotonic() + RESULTS_QUEUE_TIMEOUT
+
+        while True:
+            # Sent batches are counted before the pending count goes down
+            results_pending = scan.results_pending.value
+            self.drain_results_queue(scan_id)
+
+            if results_pending <= 0:
+                return True
+
+            if time.monotonic() >= deadline:
+                return False
+
+            time.sleep(RESULTS_FLUSH_CHECK_INTERVAL)
+
+    def drain_results_queue(self, scan_id: str) -> None:
+        """ Move the results sent by the scan processes into the results
+        table. Waits for the batches which are still being written to the
+        queue. """
+
+        scan = self.scans_table[scan_id]
+        results_sent = scan.results_sent
+        results_received = scan.results_received
+
+        with self.results_lock:
+            while True:
+                wait = results_received.value < results_sent.value
+                try:
+                    batch = scan.results_queue.get(wait, RESULTS_QUEUE_TIMEOUT)
+                except Empty:
+                    if wait:
+                        LOGGER.warning(
+                            "%s: Results sent by the scan process were lost.",
+                            scan_id,
+                        )
+                        results_received.value = results_sent.value
+                    break
+
+                results_received.value += 1
+                scan.results.extend(batch)
 
     def remove_hosts_from_target_progress(
         self, scan_id: str, hosts: List
@@ -106,58 +329,53 @@ class ScanCollection:
         if not hosts:
             return
 
-        target = self.scans_table[scan_id].get('target_progress')
+        scan = self.scans_table[scan_id]
         for host in hosts:
-            if host in target:
-                del target[host]
-
-        # Set scan_info's target_progress to propagate progresses
-        # to parent process.
-        self.scans_table[scan_id]['target_progress'] = target
+            scan.target_progress.pop(host, None)
+            scan.last_host_progress.pop(host, None)
 
     def set_progress(self, scan_id: str, progress: int) -> None:
         """ Sets scan_id scan's progress. """
 
-        if progress > 0 and progress <= 100:
-            self.scans_table[scan_id]['progress'] = progress
+        scan = self.scans_table[scan_id]
+
+        if 0 < progress <= 100 and scan.progress.value != progress:
+            scan.progress.value = progress
 
         if progress == 100:
-            self.scans_table[scan_id]['end_time'] = int(time.time())
+            self.flush_results(scan_id)
 
     def set_host_progress(self, scan_id: str, host: str, progress: int) -> None:
         """ Sets scan_id scan's progress. """
-        if progress > 0 and progress <= 100:
-            host_progresses = self.scans_table[scan_id].get('target_progress')
-            host_progresses[host] = progress
-            # Set scan_info's target_progress to propagate progresses
-            # to parent process.
-            self.scans_table[scan_id]['target_progress'] = host_progresses
+        if not 0 < progress <= 100:
+            return
 
-    def set_host_finished(self, scan_id: str, host: str) -> None:
-        """ Add the host in a list of finished hosts """
-        finished_hosts = self.scans_table[scan_id].get('finished_hosts')
+        scan = self.scans_table[scan_id]
+        if scan.last_host_progress.get(host) == progress:
+            return
 
-        if host not in finished_hosts:
-            finished_hosts.append(host)
+        scan.target_progress[host] = progress
+        scan.last_host_progress[host] = progress
 
-        self.scans_table[scan_id]['finished_hosts'] = finished_hosts
+    def set_host_finished(self, scan_id: str, host: str) -> None:
+        """ Add the host in a list of finished hosts """
+        self.flush_results(scan_id)
+        self.scans_table[scan_id].finished_hosts[host] = True
 
     def get_hosts_unfinished(self, scan_id: str) -> List[Any]:
         """ Get a list of unfinished hosts."""
 
-        unfinished_hosts = target_str_to_list(self.get_host_list(scan_id))
-
-        finished_hosts = self.get_hosts_finished(scan_id)
+        scan = self.scans_table[scan_id]
+        finished_hosts = scan.finished_hosts.copy()
 
-        for host in finished_hosts:
-            unfinished_hosts.remove(host)
-
-        return unfinished_hosts
+        return [
+            host for host in scan.target.host_list if host not in finished_hosts
+        ]
 
     def get_hosts_finished(self, scan_id: str) -> List:
         """ Get a list of finished hosts."""
 
-        return self.scans_table[scan_id].get('finished_hosts')
+        return self.scans_table[scan_id].finished_hosts.keys()
 
     def results_iterator(
         self, scan_id: str, pop_res: bool = False, max_res: int = None
@@ -170,44 +388,57 @@ class ScanCollection:
 
         max_res works only together with pop_results.
         """
-        if pop_res and max_res:
-            result_aux = self.scans_table[scan_id]['results']
-            self.scans_table[scan_id]['results'] = result_aux[max_res:]
-            return iter(result_aux[:max_res])
-        elif pop_res:
-            result_aux = self.scans_table[scan_id]['results']
-            self.scans_table[scan_id]['results'] = list()
-            return iter(result_aux)
+        self.drain_results_queue(scan_id)
 
-        return iter(self.scans_table[scan_id]['results'])
+        scan = self.scans_table[scan_id]
 
-    def ids_iterator(self) -> Iterator[str]:
-        """ Returns an iterator over the collection's scan IDS. """
+        with self.results_lock:
+            results = scan.results
 
-        return iter(self.scans_table.keys())
+            if pop_res and max_res:
+                popleft = results.popleft
+                max_res = min(max_res, len(results))
+                return iter([popleft() for _ in range(max_res)])
+            elif pop_res:
+                scan.results = deque()
+                return iter(results)
 
-    def remove_single_result(
-        self, scan_id: str, result: Dict[str, str]
-    ) -> None:
+            # A deque can't be iterated while results are being added
+            return iter(list(results))
+
+    def ids_iterator(self) -> Tuple[str, ...]:
+        """ Returns the collection's scan IDS. The IDS are a snapshot, which
+        can be iterated while scans are added or deleted. """
+
+        return tuple(self.scans_table)
+
+    def remove_single_result(self, scan_id: str, index: int) -> None:
         """Removes a single result from the result list in scan_table.
 
         Parameters:
             scan_id (uuid): Scan ID to identify the scan process to be resumed.
-            result (dict): The result to be removed from the results list.
+            index (int): The position of the result to be removed in the
+                         results list.
         """
-        results = self.scans_table[scan_id]['results']
-        results.remove(result)
-        self.scans_table[scan_id]['results'] = results
+        self.drain_results_queue(scan_id)
+
+        with self.results_lock:
+            del self.scans_table[scan_id].results[index]
 
     def del_results_for_stopped_hosts(self, scan_id: str) -> None:
         """ Remove results from the result table for those host
         """
-        unfinished_hosts = self.get_hosts_unfinished(scan_id)
-        for result in self.results_iterator(
-            scan_id, pop_res=False, max_res=None
-        ):
-            if result['host'] in unfinished_hosts:
-                self.remove_single_result(scan_id, result)
+        unfinished_hosts = frozenset(self.get_hosts_unfinished(scan_id))
+        self.drain_results_queue(scan_id)
+
+        scan = self.scans_table[scan_id]
+
+        with self.results_lock:
+            scan.results = deque(
+                result
+                for result in scan.results
+                if result['host'] not in unfinished_hosts
+            )
 
     def resume_scan(self, scan_id: str, options: Optional[Dict]) -> str:
         """ Reset the scan status in the scan_table to INIT.
@@ -222,11 +453,19 @@ class ScanCollection:
         Return:
             Scan ID which identifies the current scan.
         """
-        self.scans_table[scan_id]['status'] = ScanStatus.INIT
+        scan = self.scans_table[scan_id]
+        scan.status.value = ScanStatus.INIT.value
+        scan.flush_request.value = 0
         if options:
-            self.scans_table[scan_id]['options'] = options
+            scan.info['options'] = options
 
+        # The batches the stopped process didn't send or finish are lost.
+        # Those left in the queue are still received by the clean up.
+        scan.results_pending.value = 0
+        scan.results_received.value = scan.results_sent.value
         self.del_results_for_stopped_hosts(scan_id)
+        scan.results_sent.value = 0
+        scan.results_received.value = 0
 
         return scan_id
 
@@ -242,6 +481,8 @@ class ScanCollection:
         if not target:
             target = {}
 
+        # The data manager is started with the first scan and kept for the
+        # lifetime of the collection.
         if self.data_manager is None:
             self.data_manager = multiprocessing.Manager()
 
@@ -252,7 +493,7 @@ class ScanCollection:
             and self.id_exists(scan_id)
             and (self.get_status(scan_id) == ScanStatus.STOPPED)
         ):
-            self.scans_table[scan_id]['end_time'] = 0
+            self.scans_table[scan_id].end_time.value = 0
 
             return self.resume_scan(scan_id, options)
 
@@ -260,50 +501,93 @@ class ScanCollection:
             options = dict()
 
         scan_info = self.data_manager.dict()  # type: Dict
-        scan_info['results'] = list()
-        scan_info['finished_hosts'] = list()
-        scan_info['progress'] = 0
-        scan_info['target_progress'] = dict()
-        scan_info['target'] = target
         scan_info['vts'] = vts
         scan_info['options'] = options
         scan_info['start_time'] = int(time.time())
-        scan_info['end_time'] = 0
-        scan_info['status'] = ScanStatus.INIT
 
         if scan_id is None or scan_id == '':
             scan_id = str(uuid.uuid4())
 
         scan_info['scan_id'] = scan_id
 
-        self.scans_table[scan_id] = scan_info
+        scan = ScanData(
+            scan_info, self._create_target(target), self.data_manager
+        )
+
+        with self.scans_table_lock:
+            scans_table = dict(self.scans_table)
+            scans_table[scan_id] = scan
+            self.scans_table = scans_table
+
         return scan_id
 
     def set_status(self, scan_id: str, status: ScanStatus) -> None:
         """ Sets scan_id scan's status. """
-        self.scans_table[scan_id]['status'] = status
-        if status == ScanStatus.STOPPED:
-            self.scans_table[scan_id]['end_time'] = int(time.time())
+        scan = self.scans_table[scan_id]
+
+        self.flush_results(scan_id)
+        scan.status.value = status.value
+        if status in (ScanStatus.STOPPED, ScanStatus.FINISHED):
+            scan.end_time.value = int(time.time())
 
     def get_status(self, scan_id: str) -> ScanStatus:
         """ Get scan_id scans's status."""
 
-        return self.scans_table[scan_id]['status']
+        return ScanStatus(self.scans_table[scan_id].status.value)
 
     def get_options(self, scan_id: str) -> Dict:
         """ Get scan_id scan's options list. """
 
-        return self.scans_table[scan_id]['options']
+        return self.scans_table[scan_id].info['options']
 
     def set_option(self, scan_id, name: str, value: Any) -> None:
         """ Set a scan_id scan's name option to value. """
 
-        self.scans_table[scan_id]['options'][name] = value
+        # The options are a copy when read from the data manager, so they
+        # must be written back.
+        scan_info = self.scans_table[scan_id].info
+        options = scan_info['options']
+        options[name] = value
+        scan_info['options'] = options
 
     def get_progress(self, scan_id: str) -> int:
         """ Get a scan's current progress value. """
 
-        return self.scans_table[scan_id]['progress']
+        progress = self.scans_table[scan_id].progress.value
+
+        # Keep reporting whole progress values as integers
+        if progress.is_integer():
+            return int(progress)
+
+        return progress
+
+    @staticmethod
+    def _create_target(target: Dict) -> ScanTarget:
+        """ Unpack a target and parse its hosts and exclude hosts.
+        The finished hosts are removed from the exclude hosts, since they are
+        sent also as exclude hosts for backward compatibility purposses.
+        """
+
+        hosts = target_str_to_list(target.get('hosts')) or []
+        exc_hosts_list = target_str_to_list(target.get('exclude_hosts')) or []
+        finished_hosts_list = target_str_to_list(target.get('finished_hosts'))
+
+        if finished_hosts_list and exc_hosts_list:
+            finished_hosts = frozenset(finished_hosts_list)
+            exc_hosts_list = [
+                host for host in exc_hosts_list if host not in finished_hosts
+            ]
+
+        return ScanTarget(
+            hosts=target.get('hosts'),
+            ports=target.get('ports'),
+            exclude_hosts=target.get('exclude_hosts'),
+            finished_hosts=target.get('finished_hosts'),
+            credentials=target.get('credentials'),
+            options=target.get('options'),
+            host_list=tuple(hosts),
+            exclude_host_list=tuple(exc_hosts_list),
+        )
 
     def simplify_exclude_host_list(self, scan_id: str) -> List[Any]:
         """ Remove from exclude_hosts the received hosts in the finished_hosts
@@ -312,29 +596,17 @@ class ScanCollection:
         compatibility purposses.
         """
 
-        exc_hosts_list = target_str_to_list(self.get_exclude_hosts(scan_id))
-
-        finished_hosts_list = target_str_to_list(
-            self.get_finished_hosts(scan_id)
-        )
-
-        if finished_hosts_list and exc_hosts_list:
-            for finished in finished_hosts_list:
-                if finished in exc_hosts_list:
-                    exc_hosts_list.remove(finished)
-
-        return exc_hosts_list
+        return list(self.scans_table[scan_id].target.exclude_host_list)
 
     def calculate_target_progress(self, scan_id: str) -> float:
         """ Get a target's current progress value.
         The value is calculated with the progress of each single host
         in the target."""
 
-        host = self.get_host_list(scan_id)
-        total_hosts = len(target_str_to_list(host))
-        exc_hosts_list = self.simplify_exclude_host_list(scan_id)
-        exc_hosts = len(exc_hosts_list) if exc_hosts_list else 0
-        host_progresses = self.scans_table[scan_id].get('target_progress')
+        scan = self.scans_table[scan_id]
+        total_hosts = len(scan.target.host_list)
+        exc_hosts = len(scan.target.exclude_host_list)
+        host_progresses = scan.target_progress
 
         try:
             t_prog = sum(host_progresses.values()) / (
@@ -352,57 +624,57 @@ class ScanCollection:
     def get_start_time(self, scan_id: str) -> str:
         """ Get a scan's start time. """
 
-        return self.scans_table[scan_id]['start_time']
+        return self.scans_table[scan_id].info['start_time']
 
     def get_end_time(self, scan_id: str) -> str:
         """ Get a scan's end time. """
 
-        return self.scans_table[scan_id]['end_time']
+        return self.scans_table[scan_id].end_time.value
 
     def get_host_list(self, scan_id: str) -> Dict:
         """ Get a scan's host list. """
 
-        return self.scans_table[scan_id]['target'].get('hosts')
+        return self.scans_table[scan_id].target.hosts
 
     def get_ports(self, scan_id: str):
         """ Get a scan's ports list.
         """
-        return self.scans_table[scan_id]['target'].get('ports')
+        return self.scans_table[scan_id].target.ports
 
     def get_exclude_hosts(self, scan_id: str):
         """ Get an exclude host list for a given target.
         """
-        return self.scans_table[scan_id]['target'].get('exclude_hosts')
+        return self.scans_table[scan_id].target.exclude_hosts
 
     def get_finished_hosts(self, scan_id: str):
         """ Get the finished host list sent by the client for a given target.
         """
-        return self.scans_table[scan_id]['target'].get('finished_hosts')
+        return self.scans_table[scan_id].target.finished_hosts
 
     def get_credentials(self, scan_id: str):
         """ Get a scan's credential list. It return dictionary with
         the corresponding credential for a given target.
         """
-        return self.scans_table[scan_id]['target'].get('credentials')
+        return self.scans_table[scan_id].target.credentials
 
     def get_target_options(self, scan_id: str):
         """ Get a scan's target option dictionary.
         It return dictionary with the corresponding options for
         a given target.
         """
-        return self.scans_table[scan_id]['target'].get('options')
+        return self.scans_table[scan_id].target.options
 
     def get_vts(self, scan_id: str) -> Dict:
         """ Get a scan's vts. """
 
-        return self.scans_table[scan_id]['vts']
+        return self.scans_table[scan_id].info['vts']
 
     def release_vts_list(self, scan_id: str) -> None:
         """ Release the memory used for the vts list. """
 
-        scan_data = self.scans_table.get(scan_id)
-        if scan_data and 'vts' in scan_data:
-            del scan_data['vts']
+        scan = self.scans_table.get(scan_id)
+        if scan and 'vts' in scan.info:
+            del scan.info['vts']
 
     def id_exists(self, scan_id: str) -> bool:
         """ Check whether a scan exists in the table. """
@@ -415,10 +687,19 @@ class ScanCollection:
         if self.get_status(scan_id) == ScanStatus.RUNNING:
             return False
 
-        self.scans_table.pop(scan_id)
+        with self.scans_table_lock:
+            scans_table = dict(self.scans_table)
+            scan = scans_table.pop(scan_id)
+            self.scans_table = scans_table
 
-        if len(self.scans_table) == 0:
-            del self.data_manager
-            self.data_manager = None
+        scan.results_queue.close()
 
         return True
+
+    def close(self) -> None:
+        """ Shut down the data manager of the collection, if it was started.
+        """
+
+        if self.data_manager is not None:
+            self.data_manager.shutdown()
+            self.data_manager = None
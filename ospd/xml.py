@@ -34,6 +34,9 @@ r = re.compile(
     + r'\u0100-\uD7FF\uE000-\uFDCF\uFDE0-\uFFFD])|([\n])|$)'
 )
 
+# Matches any byte which is not printable ASCII, a tab or a line break
+_NON_PRINTABLE_ASCII_BYTES = re.compile(b'[^\x09\x0A\x0D\x20-\x7E]')
+
 
 def split_invalid_xml(result_text: str) -> Union[List[Union[str, int]], str]:
     """ Search for occurence of non printable chars and replace them
@@ -104,7 +107,7 @@ def simple_response_str(
     command: str,
     status: int,
     status_text: str,
-    content: Union[str, Element, List[str], List[Element]] = "",
+    content: Union[str, bytes, Element, List[str], List[Element]] = "",
 ) -> bytes:
     """ Creates an OSP response XML string.
 
@@ -112,11 +115,35 @@ def simple_response_str(
         command (str): OSP Command to respond to.
         status (int): Status of the response.
         status_text (str): Status text of the response.
-        content (str): Text part of the response XML element.
+        content (str, bytes): Text part of the response XML element. Bytes
+            must be UTF-8 encoded.
 
     Return:
         String of response in xml format.
     """
+    if isinstance(content, bytes):
+        if content and not _NON_PRINTABLE_ASCII_BYTES.search(content):
+            # Printable ASCII only needs the XML special chars to be escaped,
+            # so the content can be used without decoding it.
+            return b''.join(
+                [
+                    (
+                        '<%s_response status=%s status_text=%s>'
+                        % (
+                            command,
+                            quoteattr(escape(str(status))),
+                            quoteattr(escape(str(status_text))),
+                        )
+                    ).encode('utf-8'),
+                    content.replace(b'&', b'&amp;')
+                    .replace(b'<', b'&lt;')
+                    .replace(b'>', b'&gt;'),
+                    ('</%s_response>' % command).encode('utf-8'),
+                ]
+            )
+
+        content = content.decode()
+
     response = Element('%s_response' % command)
 
     for name, value in [('status', str(status)), ('status_text', status_text)]:
@@ -16,6 +16,8 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import os
+import subprocess
 import time
 
 from unittest import TestCase
@@ -24,6 +26,8 @@ from unittest.mock import patch
 from xml.etree import ElementTree as et
 
 from ospd.command.command import (
+    HelpCommand,
+    GetVersion,
     GetPerformance,
     StartScan,
     StopScan,
@@ -35,11 +39,84 @@ from ospd.misc import create_process
 from ..helper import DummyWrapper, assert_called, FakeStream
 
 
+class HelpCommandTestCase(TestCase):
+    def test_help_response_is_cached(self):
+        daemon = DummyWrapper([])
+        cmd = HelpCommand(daemon)
+        request = et.fromstring('<help format="xml" />')
+
+        response = cmd.handle_xml(request)
+
+        self.assertIs(cmd.handle_xml(request), response)
+
+    def test_help_cache_invalidated(self):
+        daemon = DummyWrapper([])
+        cmd = HelpCommand(daemon)
+        request = et.fromstring('<help format="xml" />')
+
+        cmd.handle_xml(request)
+
+        daemon.set_command_attributes('get_scans', {'foo': 'bar'})
+        response = et.fromstring(cmd.handle_xml(request))
+
+        attributes = response.find('get_scans/attributes')
+        self.assertIsNotNone(attributes.find('foo'))
+
+    def test_help_bogus_format(self):
+        cmd = HelpCommand(DummyWrapper([]))
+        request = et.fromstring('<help format="foo" />')
+
+        with self.assertRaises(OspdCommandError):
+            cmd.handle_xml(request)
+
+
+class GetVersionTestCase(TestCase):
+    def test_get_version(self):
+        daemon = DummyWrapper([])
+        cmd = GetVersion(daemon)
+
+        request = et.fromstring('<get_version/>')
+
+        response = et.fromstring(cmd.handle_xml(request))
+
+        self.assertEqual(response.get('status'), '200')
+        self.assertEqual(response.findtext('protocol/name'), 'OSP')
+        self.assertEqual(
+            response.findtext('daemon/version'), daemon.get_daemon_version()
+        )
+        self.assertIsNone(response.find('vts'))
+
+    def test_get_version_vts_version_changed(self):
+        daemon = DummyWrapper([])
+        cmd = GetVersion(daemon)
+        request = et.fromstring('<get_version/>')
+
+        cmd.handle_xml(request)
+        daemon.set_vts_version('1<2')
+
+        response = et.fromstring(cmd.handle_xml(request))
+
+        self.assertEqual(response.findtext('vts/version'), '1<2')
+
+    def test_get_version_without_scanner_version(self):
+        daemon = DummyWrapper([])
+        daemon.scanner_info['version'] = None
+        cmd = GetVersion(daemon)
+        request = et.fromstring('<get_version/>')
+
+        response = et.fromstring(cmd.handle_xml(request))
+
+        self.assertEqual(response.get('status'), '200')
+        self.assertEqual(response.findtext('scanner/version'), '')
+
+
 class GetPerformanceTestCase(TestCase):
     @patch('ospd.command.command.subprocess')
     def test_get_performance(self, mock_subproc):
         cmd = GetPerformance(None)
-        mock_subproc.check_output.return_value = b'foo'
+        mock_proc = mock_subproc.Popen.return_value.__enter__.return_value
+        mock_proc.stdout.read.return_value = b'foo'
+        mock_proc.wait.return_value = 0
         response = et.fromstring(
             cmd.handle_xml(
                 et.fromstring(
@@ -51,6 +128,20 @@ class GetPerformanceTestCase(TestCase):
         self.assertEqual(response.get('status'), '200')
         self.assertEqual(response.tag, 'get_performance_response')
 
+    @patch('ospd.command.command.subprocess')
+    def test_get_performance_fail_exit_code(self, mock_subproc):
+        cmd = GetPerformance(None)
+        mock_subproc.CalledProcessError = subprocess.CalledProcessError
+        mock_proc = mock_subproc.Popen.return_value.__enter__.return_value
+        mock_proc.stdout.read.return_value = b''
+        mock_proc.wait.return_value = 1
+        request = et.fromstring(
+            '<get_performance start="0" end="0" titles="mem"/>'
+        )
+
+        with self.assertRaises(OspdCommandError):
+            cmd.handle_xml(request)
+
     def test_get_performance_fail_int(self):
         cmd = GetPerformance(None)
         request = et.fromstring(
@@ -69,6 +160,32 @@ class GetPerformanceTestCase(TestCase):
         with self.assertRaises(OspdCommandError):
             cmd.handle_xml(request)
 
+    def test_get_performance_fail_trailing_chars(self):
+        cmd = GetPerformance(None)
+        request = et.fromstring(
+            '<get_performance start="0" end="0" titles="proc;rm"/>'
+        )
+
+        with self.assertRaises(OspdCommandError):
+            cmd.handle_xml(request)
+
+    @patch('ospd.command.command.subprocess')
+    def test_get_performance_wildcard_title(self, mock_subproc):
+        cmd = GetPerformance(None)
+        mock_proc = mock_subproc.Popen.return_value.__enter__.return_value
+        mock_proc.stdout.read.return_value = b'foo'
+        mock_proc.wait.return_value = 0
+        response = et.fromstring(
+            cmd.handle_xml(
+                et.fromstring(
+                    '<get_performance start="0" end="0" '
+                    'titles="interface-eth0-traffic"/>'
+                )
+            )
+        )
+
+        self.assertEqual(response.get('status'), '200')
+
     def test_get_performance_fail_cmd(self):
         cmd = GetPerformance(None)
         request = et.fromstring(
@@ -98,6 +215,18 @@ class StartScanTestCase(TestCase):
         with self.assertRaises(OspdCommandError):
             cmd.handle_xml(request)
 
+    def test_scan_invalid_scan_id_checked_first(self):
+        daemon = DummyWrapper([])
+        cmd = StartScan(daemon)
+        request = et.fromstring(
+            '<start_scan scan_id="foo"><vt_selection /></start_scan>'
+        )
+
+        with self.assertRaises(OspdCommandError) as context:
+            cmd.handle_xml(request)
+
+        self.assertEqual(context.exception.message, 'Invalid scan_id UUID')
+
     @patch("ospd.command.command.create_process")
     def test_scan_with_vts(self, mock_create_process):
         daemon = DummyWrapper([])
@@ -360,12 +489,30 @@ class StopCommandTestCase(TestCase):
 
 
 class GetMemoryUsageTestCase(TestCase):
+    def test_get_memory(self):
+        self.assertEqual(GetMemoryUsage._get_memory(1536), '1536')
+        self.assertEqual(GetMemoryUsage._get_memory(1536, 'b'), '1536')
+        self.assertEqual(GetMemoryUsage._get_memory(1536, 'KB'), '1.5')
+        self.assertEqual(
+            GetMemoryUsage._get_memory(3 * 1024 * 1024, 'mb'), '3.0'
+        )
+
+    @patch('ospd.command.command.psutil')
+    def test_process_reused(self, mock_psutil):
+        cmd = GetMemoryUsage(DummyWrapper([]))
+        request = et.fromstring('<get_memory_usage />')
+
+        b''.join(cmd.handle_xml(request))
+        b''.join(cmd.handle_xml(request))
+
+        mock_psutil.Process.assert_called_once_with(os.getpid())
+
     def test_with_main_process_only(self):
-        cmd = GetMemoryUsage(None)
+        cmd = GetMemoryUsage(DummyWrapper([]))
 
         request = et.fromstring('<get_memory_usage />')
 
-        response = et.fromstring(cmd.handle_xml(request))
+        response = et.fromstring(b''.join(cmd.handle_xml(request)))
         processes_element = response.find('processes')
 
         process_elements = processes_element.findall('process')
@@ -388,21 +535,28 @@ class GetMemoryUsageTestCase(TestCase):
         self.assertIsNotNone(shared_element.text)
 
     def test_with_subprocess(self):
-        cmd = GetMemoryUsage(None)
+        daemon = DummyWrapper([])
+        cmd = GetMemoryUsage(daemon)
 
         def foo():  # pylint: disable=blacklisted-name
             time.sleep(60)
 
-        create_process(foo, args=[])
+        scan_process = create_process(foo, args=[])
+        daemon.scan_processes['foo'] = scan_process
+        scan_process.start()
+        self.addCleanup(scan_process.terminate)
 
         request = et.fromstring('<get_memory_usage />')
 
-        response = et.fromstring(cmd.handle_xml(request))
+        response = et.fromstring(b''.join(cmd.handle_xml(request)))
         processes_element = response.find('processes')
 
         process_elements = processes_element.findall('process')
 
-        self.assertTrue(len(process_elements), 2)
+        self.assertEqual(len(process_elements), 2)
+        self.assertEqual(
+            process_elements[1].get('pid'), str(scan_process.pid)
+        )
 
         for process_element in process_elements:
             rss_element = process_element.find('rss')
@@ -418,8 +572,28 @@ class GetMemoryUsageTestCase(TestCase):
             self.assertIsNotNone(shared_element)
             self.assertIsNotNone(shared_element.text)
 
+    def test_with_finished_subprocess(self):
+        daemon = DummyWrapper([])
+        cmd = GetMemoryUsage(daemon)
+
+        def foo():  # pylint: disable=blacklisted-name
+            pass
+
+        scan_process = create_process(foo, args=[])
+        daemon.scan_processes['foo'] = scan_process
+        scan_process.start()
+        scan_process.join()
+
+        request = et.fromstring('<get_memory_usage />')
+
+        response = et.fromstring(b''.join(cmd.handle_xml(request)))
+        process_elements = response.findall('processes/process')
+
+        self.assertEqual(len(process_elements), 1)
+        self.assertEqual(process_elements[0].get('pid'), str(os.getpid()))
+
     def test_with_subsubprocess(self):
-        cmd = GetMemoryUsage(None)
+        cmd = GetMemoryUsage(DummyWrapper([]))
 
         def bar():  # pylint: disable=blacklisted-name
             create_process(foo, args=[])
@@ -431,7 +605,7 @@ class GetMemoryUsageTestCase(TestCase):
 
         request = et.fromstring('<get_memory_usage />')
 
-        response = et.fromstring(cmd.handle_xml(request))
+        response = et.fromstring(b''.join(cmd.handle_xml(request)))
         processes_element = response.find('processes')
 
         process_elements = processes_element.findall('process')
@@ -21,6 +21,7 @@
 """ Test module for scan runs
 """
 
+import multiprocessing
 import time
 import unittest
 
@@ -31,6 +32,8 @@ import defusedxml.lxml as secET
 
 from defusedxml.common import EntitiesForbidden
 
+from ospd.scan import ScanStatus
+
 from .helper import DummyWrapper, assert_called, FakeStream
 
 
@@ -252,6 +255,65 @@ class ScanTestCase(unittest.TestCase):
         params = response.findall('vts/vt/params/param')
         self.assertEqual(2, len(params))
 
+    def test_get_vt_xml_str(self):
+        daemon = DummyWrapper([])
+        daemon.add_vt(
+            '1.2.3.4',
+            'A <vulnerability> test',
+            vt_params="a",
+            vt_refs="b",
+            vt_dependencies="c",
+            summary="d",
+            detection="e",
+            qod_t="f",
+            severities="g",
+            custom="h",
+        )
+        single_vt = ('1.2.3.4', daemon.vts['1.2.3.4'])
+
+        vt_xml_str = daemon.get_vt_xml_str(single_vt)
+
+        self.assertIn(b'<name>A &lt;vulnerability&gt; test</name>', vt_xml_str)
+
+        for vt_xml in (ET.fromstring(vt_xml_str), daemon.get_vt_xml(single_vt)):
+            self.assertEqual(vt_xml.tag, 'vt')
+            self.assertEqual(vt_xml.get('id'), '1.2.3.4')
+            self.assertEqual(vt_xml.findtext('name'), 'A <vulnerability> test')
+            self.assertEqual(
+                [elem.tag for elem in vt_xml],
+                [
+                    'name',
+                    'params',
+                    'refs',
+                    'dependencies',
+                    'summary',
+                    'detection',
+                    'severities',
+                    'custom',
+                ],
+            )
+            self.assertEqual(len(vt_xml.findall('params/param')), 2)
+            self.assertEqual(vt_xml.findtext('custom/mytest'), 'static test')
+
+    def test_get_vts_with_overridden_get_vt_xml(self):
+        class VtXmlWrapper(DummyWrapper):
+            def get_vt_xml(self, single_vt):
+                vt_xml = super().get_vt_xml(single_vt)
+                vt_xml.set('foo', 'bar')
+                return vt_xml
+
+        daemon = VtXmlWrapper([])
+        daemon.add_vt('1.2.3.4', 'A vulnerability test')
+        fs = FakeStream()
+
+        daemon.handle_command('<get_vts vt_id="1.2.3.4"></get_vts>', fs)
+        response = fs.get_response()
+
+        vt = response.find('vts/vt')
+        self.assertEqual(vt.get('id'), '1.2.3.4')
+        self.assertEqual(vt.get('foo'), 'bar')
+        self.assertEqual(vt.findtext('name'), 'A vulnerability test')
+
     def test_get_vts_vts_with_refs(self):
         daemon = DummyWrapper([])
         daemon.add_vt(
@@ -522,7 +584,7 @@ class ScanTestCase(unittest.TestCase):
         self.assertEqual(len(list(daemon.scan_collection.ids_iterator())), 1)
 
         # Set an old end_time
-        daemon.scan_collection.scans_table[scan_id]['end_time'] = 123456
+        daemon.scan_collection.scans_table[scan_id].end_time.value = 123456
         # Run the check
         daemon.clean_forgotten_scans()
         # Not removed
@@ -784,7 +846,7 @@ class ScanTestCase(unittest.TestCase):
         scan_id = response.findtext('id')
         time.sleep(1)
         finished = daemon.get_scan_finished_hosts(scan_id)
-        self.assertEqual(finished, ['192.168.10.23', '192.168.10.24'])
+        self.assertEqual(sorted(finished), ['192.168.10.23', '192.168.10.24'])
 
     def test_progress(self):
         daemon = DummyWrapper([])
@@ -940,3 +1002,302 @@ class ScanTestCase(unittest.TestCase):
         for idx, res in enumerate(results):
             att_dict = res.attrib
             self.assertEqual(hosts[idx], att_dict['name'])
+
+    def test_result_from_scan_process(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        scan_process = multiprocessing.Process(
+            target=daemon.add_scan_log,
+            args=(scan_id,),
+            kwargs={'host': 'localhost', 'name': 'foo'},
+        )
+        scan_process.start()
+        scan_process.join()
+
+        results = list(daemon.scan_collection.results_iterator(scan_id, True))
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['name'], 'foo')
+
+    def test_results_received_before_finished_status(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        # Large results take a while to be written to the results queue
+        def scan():
+            for i in range(10):
+                daemon.add_scan_log(
+                    scan_id, host='localhost', name=str(i), value='x' * 100000
+                )
+            daemon.finish_scan(scan_id)
+
+        scan_process = multiprocessing.Process(target=scan, daemon=True)
+        scan_process.start()
+        self.addCleanup(scan_process.join, 5)
+
+        deadline = time.monotonic() + 5
+        while daemon.get_scan_status(scan_id) != ScanStatus.FINISHED:
+            if time.monotonic() > deadline:
+                self.fail('The scan was not finished')
+            time.sleep(0.001)
+
+        results = list(daemon.scan_collection.results_iterator(scan_id))
+
+        self.assertEqual(len(results), 10)
+
+    def test_del_results_for_stopped_hosts(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': '192.168.0.1-2', 'ports': '22'}, {}, {}
+        )
+
+        daemon.add_scan_log(scan_id, host='192.168.0.1', name='foo')
+        daemon.add_scan_log(scan_id, host='192.168.0.2', name='bar')
+        daemon.add_scan_log(scan_id, host='192.168.0.1', name='baz')
+        daemon.set_scan_host_finished(scan_id, '192.168.0.1')
+
+        daemon.scan_collection.del_results_for_stopped_hosts(scan_id)
+
+        results = list(daemon.scan_collection.results_iterator(scan_id))
+        self.assertEqual(
+            [result['name'] for result in results], ['foo', 'baz']
+        )
+
+    def test_scan_state_from_scan_process(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        scan_process = multiprocessing.Process(
+            target=daemon.set_scan_status,
+            args=(scan_id, ScanStatus.STOPPED),
+        )
+        scan_process.start()
+        scan_process.join()
+
+        self.assertEqual(daemon.get_scan_status(scan_id), ScanStatus.STOPPED)
+        self.assertNotEqual(daemon.get_scan_end_time(scan_id), 0)
+        self.assertEqual(daemon.get_scan_progress(scan_id), 0)
+        self.assertIsInstance(daemon.get_scan_progress(scan_id), int)
+
+    def test_end_time_set_when_finished(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        daemon.set_scan_progress(scan_id, 100)
+        self.assertEqual(daemon.get_scan_end_time(scan_id), 0)
+
+        daemon.set_scan_status(scan_id, ScanStatus.FINISHED)
+        self.assertNotEqual(daemon.get_scan_end_time(scan_id), 0)
+
+    def test_data_manager_kept_after_delete_scan(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+        data_manager = daemon.scan_collection.data_manager
+
+        daemon.delete_scan(scan_id)
+        self.assertIs(daemon.scan_collection.data_manager, data_manager)
+
+        daemon.scan_collection.close()
+        self.assertIsNone(daemon.scan_collection.data_manager)
+
+    def test_set_host_progress_after_remove(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost1, localhost2', 'ports': '22'}, {}, {}
+        )
+
+        daemon.set_scan_host_progress(scan_id, 'localhost1', 50)
+        daemon.set_scan_host_progress(scan_id, 'localhost1', 50)
+        self.assertEqual(daemon.get_scan_progress(scan_id), 25)
+
+        daemon.remove_scan_hosts_from_target_progress(scan_id, ['localhost1'])
+        daemon.set_scan_host_progress(scan_id, 'localhost1', 50)
+        self.assertEqual(daemon.calculate_progress(scan_id), 25)
+
+    def test_set_scan_option(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {'foo': 'bar'}, {}
+        )
+
+        daemon.set_scan_option(scan_id, 'foo', 'baz')
+
+        self.assertEqual(daemon.get_scan_options(scan_id), {'foo': 'baz'})
+
+    def test_ids_iterator_while_deleting_scans(self):
+        daemon = DummyWrapper([])
+        for _ in range(2):
+            daemon.create_scan(
+                None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+            )
+
+        scan_ids = []
+        for scan_id in daemon.scan_collection.ids_iterator():
+            daemon.delete_scan(scan_id)
+            scan_ids.append(scan_id)
+
+        self.assertEqual(len(scan_ids), 2)
+        self.assertEqual(list(daemon.scan_collection.ids_iterator()), [])
+
+    def test_results_batched_in_scan_process(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        def add_results():
+            for i in range(3):
+                daemon.add_scan_log(scan_id, host='localhost', name=str(i))
+
+            scan = daemon.scan_collection.scans_table[scan_id]
+            pending = scan.pending_results
+            assert len(pending) == 3
+
+            daemon.set_scan_host_finished(scan_id, 'localhost')
+
+        scan_process = multiprocessing.Process(target=add_results)
+        scan_process.start()
+        scan_process.join()
+        self.assertEqual(scan_process.exitcode, 0)
+
+        results = list(daemon.scan_collection.results_iterator(scan_id, True))
+
+        self.assertEqual(
+            [result['name'] for result in results], ['0', '1', '2']
+        )
+
+    def test_resume_scan_resets_results_counts(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        # A scan process terminated with pending and unsent results
+        scan = daemon.scan_collection.scans_table[scan_id]
+        scan.results_pending.value = 3
+        scan.results_sent.value = 2
+        daemon.set_scan_status(scan_id, ScanStatus.STOPPED)
+
+        daemon.create_scan(
+            scan_id, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        self.assertEqual(scan.results_pending.value, 0)
+        self.assertEqual(scan.results_sent.value, 0)
+        self.assertEqual(scan.results_received.value, 0)
+        self.assertTrue(daemon.scan_collection.collect_pending_results(scan_id))
+
+    def test_pending_results_sent_on_exit(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        def add_results():
+            daemon.add_scan_log(scan_id, host='localhost', name='a')
+            daemon.scan_collection.flush_results(scan_id)
+
+            for name in ('b', 'c', 'd'):
+                daemon.add_scan_log(scan_id, host='localhost', name=name)
+
+        scan_process = multiprocessing.Process(target=add_results)
+        scan_process.start()
+        scan_process.join(5)
+        self.assertEqual(scan_process.exitcode, 0)
+
+        results = list(daemon.scan_collection.results_iterator(scan_id))
+
+        self.assertEqual(
+            [result['name'] for result in results], ['a', 'b', 'c', 'd']
+        )
+
+    def test_pending_results_sent_periodically(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        def scan():
+            for i in range(3):
+                daemon.add_scan_log(scan_id, host='localhost', name=str(i))
+            time.sleep(60)
+
+        scan_process = multiprocessing.Process(target=scan, daemon=True)
+        scan_process.start()
+        self.addCleanup(scan_process.join, 5)
+        self.addCleanup(scan_process.terminate)
+
+        results = []
+        deadline = time.monotonic() + 5
+        while len(results) < 3:
+            if time.monotonic() > deadline:
+                self.fail('The pending results were not sent')
+            time.sleep(0.1)
+            results.extend(
+                daemon.scan_collection.results_iterator(scan_id, True)
+            )
+
+        self.assertEqual(
+            [result['name'] for result in results], ['0', '1', '2']
+        )
+
+    @patch('ospd.scan.RESULTS_FLUSH_INTERVAL', 60)
+    def test_collect_pending_results(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+        results_pending = daemon.scan_collection.scans_table[
+            scan_id
+        ].results_pending
+
+        def scan():
+            for i in range(3):
+                daemon.add_scan_log(scan_id, host='localhost', name=str(i))
+            time.sleep(60)
+
+        scan_process = multiprocessing.Process(target=scan, daemon=True)
+        scan_process.start()
+        self.addCleanup(scan_process.join, 5)
+
+        deadline = time.monotonic() + 5
+        while results_pending.value < 3:
+            if time.monotonic() > deadline:
+                self.fail('The results were not added')
+            time.sleep(0.001)
+
+        self.assertTrue(daemon.scan_collection.collect_pending_results(scan_id))
+        scan_process.terminate()
+
+        results = list(daemon.scan_collection.results_iterator(scan_id))
+
+        self.assertEqual(
+            [result['name'] for result in results], ['0', '1', '2']
+        )
+
+    def test_remove_single_result(self):
+        daemon = DummyWrapper([])
+        scan_id = daemon.create_scan(
+            None, {'hosts': 'localhost', 'ports': '22'}, {}, {}
+        )
+
+        for name in ('foo', 'bar', 'baz'):
+            daemon.add_scan_log(scan_id, host='localhost', name=name)
+
+        daemon.scan_collection.remove_single_result(scan_id, 1)
+
+        results = list(daemon.scan_collection.results_iterator(scan_id))
+        self.assertEqual(
+            [result['name'] for result in results], ['foo', 'baz']
+        )
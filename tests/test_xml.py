@@ -20,7 +20,7 @@ from collections import OrderedDict
 
 from unittest import TestCase
 
-from ospd.xml import elements_as_text, escape_ctrl_chars
+from ospd.xml import elements_as_text, escape_ctrl_chars, simple_response_str
 
 from xml.etree.ElementTree import Element, tostring, fromstring
 
@@ -116,3 +116,27 @@ class EscapeText(TestCase):
         self.assertEqual(
             b'<text>' + new_elem.text.encode('utf-8') + b'</text>', elem_as_str
         )
+
+
+class SimpleResponseStrTestCase(TestCase):
+    def test_bytes_content(self):
+        response = simple_response_str('foo', 200, 'OK', b'a <b> & c\n')
+
+        self.assertEqual(
+            response, simple_response_str('foo', 200, 'OK', 'a <b> & c\n')
+        )
+        self.assertEqual(fromstring(response).text, 'a <b> & c\n')
+
+    def test_bytes_content_not_ascii(self):
+        content = 'f\u00f6\u00f6\x01'
+
+        response = simple_response_str('foo', 200, 'OK', content.encode())
+
+        self.assertEqual(
+            response, simple_response_str('foo', 200, 'OK', content)
+        )
+
+    def test_empty_bytes_content(self):
+        response = simple_response_str('foo', 200, 'OK', b'')
+
+        self.assertEqual(response, simple_response_str('foo', 200, 'OK', ''))